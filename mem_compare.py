@@ -16,8 +16,9 @@ Each input JSON is expected to look like:
 Features:
 - Finds the max common iteration across all files (i.e., min of per-file max iteration).
 - Trims series to that common range for apples-to-apples comparison.
-- Downsamples to a target number of points by averaging within buckets.
-- Plots a PNG (matplotlib) and/or writes a reduced JSON for the web.
+- Downsamples to a target number of points: M4 (first/last/min/max per bucket, keeps
+  peaks), LTTB, or plain bucket averaging.
+- Plots a PNG (matplotlib) and/or writes a reduced JSON or Vega-Lite spec for the web.
 - Choose the metric (rss, heapUsed, heapTotal, external, arrayBuffers). Default: rss.
 
 Usage examples:
@@ -27,22 +28,42 @@ Usage examples:
   # Create a smaller JSON suitable for a web page (Plotly/D3/etc)
   ./mem_compare.py memory_stats_*.json --output-json reduced.json --target-points 400
 
+  # Emit a Vega-Lite spec instead (rendered by the browser, no matplotlib needed)
+  ./mem_compare.py memory_stats_*.json --output-vega chart.vl.json
+
   # Change metric to heapUsed
   ./mem_compare.py memory_stats_*.json --metric heapUsed --output-plot heap_used.png
 """
 import argparse
+import array
+import concurrent.futures
+import functools
+import gzip
 import json
 import math
 import os
-from typing import List, Dict, Any, Tuple, Optional
-
-import matplotlib
-matplotlib.use("Agg")  # headless
-import matplotlib.pyplot as plt
+import re
+import tempfile
+import zipfile
+from collections import Counter
+from typing import List, Dict, Any, BinaryIO, Tuple, Optional
+
+import numpy as np
+try:
+    import orjson  # much faster parse/serialize for large stats logs
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+try:
+    import ijson  # incremental parser for --stream-parse
+except ImportError:  # pragma: no cover - optional
+    ijson = None
 
 
 Metric = str
 
+# Metrics reported in bytes by process.memoryUsage(); converted to MB on load.
+BYTE_METRICS = frozenset({"rss", "heapUsed", "heapTotal", "external", "arrayBuffers"})
+
 
 def human_metric_name(metric: Metric) -> str:
     mapping = {
@@ -55,135 +76,435 @@ def human_metric_name(metric: Metric) -> str:
     return mapping.get(metric, metric)
 
 
-def bytes_like_to_mb(value: float, metric: Metric) -> float:
+def mb_scale(metric: Metric) -> float:
     """
-    Convert value to MB if it's a byte-like metric. For arrayBuffers we also treat as bytes.
+    Factor converting a raw value to MB if it's a byte-like metric (arrayBuffers included).
     """
-    if metric in ("rss", "heapUsed", "heapTotal", "external", "arrayBuffers"):
-        return float(value) / (1024 * 1024.0)
-    return float(value)
+    return 1.0 / (1024 * 1024) if metric in BYTE_METRICS else 1.0
+
+
+def _json_loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
-def load_series(path: str, metric: Metric) -> Tuple[str, List[int], List[float]]:
+def _json_dumps(obj: Any) -> bytes:
     """
-    Returns (label, iterations, values_mb)
-    Label is derived from filename, e.g., postgres/sqlite/duckdb inferred from path.
+    Minified JSON as bytes. numpy arrays are serialized as lists.
     """
-    with open(path, "r") as f:
-        data = json.load(f)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode("utf-8")
 
-    stats = data.get("stats", [])
-    iterations = []
-    values = []
-    for row in stats:
-        it = row.get("iteration")
-        if it is None:
-            continue
-        val = row.get(metric)
-        if val is None:
-            # If metric is missing in a row, skip it.
-            continue
-        iterations.append(int(it))
-        values.append(bytes_like_to_mb(val, metric))
 
-    # Guess a nicer label from filename:
+def guess_label(path: str) -> str:
+    """
+    Guess a nicer label from filename, e.g., postgres/sqlite/duckdb inferred from path.
+    """
     base = os.path.basename(path).lower()
     if "duckdb" in base:
-        label = "DuckDB"
+        return "DuckDB"
     elif "sqlite" in base:
-        label = "SQLite"
+        return "SQLite"
     elif "postgres" in base or "postgre" in base:
-        label = "Postgres"
-    else:
-        label = os.path.basename(path)
+        return "Postgres"
+    return os.path.basename(path)
+
+
+def _engine_tail(path: str) -> str:
+    # Part of the file stem after the engine name: memory_stats_duckdb_1712 -> "1712"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.split(r"duckdb|sqlite|postgres|postgre", stem, maxsplit=1,
+                    flags=re.IGNORECASE)[-1].strip("_-. ")
+
+
+def disambiguate_labels(labels: List[str], paths: List[str]) -> List[str]:
+    """
+    When several files map to the same label (e.g., two DuckDB runs), suffix them with
+    the shortest thing that tells them apart: the part of the filename after the engine
+    name (memory_stats_duckdb_2.json -> "DuckDB-2", while memory_stats_duckdb.json keeps
+    the bare "DuckDB"), else the parent directory (r1/memory_stats_duckdb.json ->
+    "DuckDB-r1"), else an ordinal. Labels that are already the file's basename only get
+    the parent directory or an ordinal.
+    """
+    out = list(labels)
+    for label, count in Counter(labels).items():
+        if count == 1:
+            continue
+        idxs = [k for k, l in enumerate(labels) if l == label]
+        if label == os.path.basename(paths[idxs[0]]):
+            tails = [""] * count
+        else:
+            tails = [_engine_tail(paths[k]) for k in idxs]
+        if len(set(tails)) == count:
+            suffixes = tails
+        else:
+            parents = [os.path.basename(os.path.dirname(os.path.abspath(paths[k]))) for k in idxs]
+            suffixes = [f"{p}/{t}" if t else p for p, t in zip(parents, tails)]
+            if not all(parents) or len(set(suffixes)) < count:
+                suffixes = [str(n) for n in range(1, count + 1)]
+        for k, suffix in zip(idxs, suffixes):
+            out[k] = f"{label}-{suffix}" if suffix else label
+    return out
+
+
+def _parse_series(path: str, metric: Metric) -> Tuple[np.ndarray, np.ndarray]:
+    with open(path, "rb") as f:
+        data = _json_loads(f.read())
+
+    stats = data.get("stats", [])
+    # Skip rows without an iteration or without the metric.
+    rows = [r for r in stats if r.get("iteration") is not None and r.get(metric) is not None]
+    iterations = np.fromiter((r["iteration"] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[metric] for r in rows), dtype=np.float64, count=len(rows))
+    values *= mb_scale(metric)
+    return iterations, values
+
+
+def _stream_parse_series(path: str, metric: Metric) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Like _parse_series, but walks the stats rows with ijson one at a time, so peak
+    memory is bounded by the output arrays rather than the whole JSON object graph.
+    """
+    # Typed arrays store unboxed 8-byte items instead of one Python object per sample.
+    iterations = array.array("q")
+    values = array.array("d")
+    scale = mb_scale(metric)
+    with open(path, "rb") as f:
+        for row in ijson.items(f, "stats.item", use_float=True):
+            it = row.get("iteration")
+            val = row.get(metric)
+            if it is None or val is None:
+                continue
+            iterations.append(int(it))
+            values.append(val * scale)
+    return np.frombuffer(iterations, dtype=np.int64), np.frombuffer(values, dtype=np.float64)
+
+
+def load_series(
+    path: str,
+    metric: Metric,
+    cache: bool = True,
+    stream: bool = False,
+) -> Tuple[str, np.ndarray, np.ndarray]:
+    """
+    Returns (label, iterations, values_mb) as int64/float64 arrays.
+    With cache=True the extracted arrays are kept in a "<path>.<metric>.npz" sidecar,
+    reused only while the log's mtime (ns) and size match the ones recorded in it.
+    With stream=True the log is parsed incrementally (requires ijson).
+    """
+    label = guess_label(path)
+    st = os.stat(path)
+    if cache:
+        cached = _read_sidecar(path, metric, st)
+        if cached is not None:
+            return (label,) + cached
+
+    parse = _stream_parse_series if stream else _parse_series
+    iterations, values = parse(path, metric)
+    if cache:
+        _write_sidecar(f"{path}.{metric}.npz", iterations, values, st)
     return label, iterations, values
 
 
+def _read_sidecar(
+    path: str,
+    metric: Metric,
+    st: Optional[os.stat_result] = None,
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the cached (iterations, values) for path, or None if there is no usable
+    sidecar matching the log's current mtime and size.
+    """
+    if st is None:
+        st = os.stat(path)
+    try:
+        with np.load(f"{path}.{metric}.npz") as z:
+            if int(z["src_mtime_ns"]) == st.st_mtime_ns and int(z["src_size"]) == st.st_size:
+                return z["iters"], z["vals"]
+    except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+        # Missing, truncated or old-format sidecar: just parse again.
+        pass
+    return None
+
+
+def _write_sidecar(sidecar: str, iterations: np.ndarray, values: np.ndarray,
+                   st: os.stat_result) -> None:
+    """
+    Writes the cache atomically (temp file + rename), so an interrupted or concurrent
+    run never leaves a truncated sidecar behind.
+    """
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(sidecar) or ".",
+                                   prefix=os.path.basename(sidecar) + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, iters=iterations, vals=values,
+                     src_mtime_ns=st.st_mtime_ns, src_size=st.st_size)
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        print(f"Warning: could not write cache {sidecar}: {e}")
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def load_all_series(
+    paths: List[str],
+    metric: Metric,
+    cache: bool = True,
+    stream: bool = False,
+) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """
+    Loads every path with load_series, in input order, with labels made unique via
+    disambiguate_labels. Cached series are read in-process; when several files need
+    parsing, that is spread over worker processes (JSON decoding holds the GIL).
+    """
+    results: List[Optional[Tuple[str, np.ndarray, np.ndarray]]] = [None] * len(paths)
+    if cache:
+        for k, path in enumerate(paths):
+            cached = _read_sidecar(path, metric)
+            if cached is not None:
+                results[k] = (guess_label(path),) + cached
+
+    misses = [k for k, r in enumerate(results) if r is None]
+    load = functools.partial(load_series, metric=metric, cache=cache, stream=stream)
+    workers = min(len(misses), os.cpu_count() or 1)
+    if workers <= 1:
+        parsed = map(load, (paths[k] for k in misses))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(load, [paths[k] for k in misses]))
+    for k, result in zip(misses, parsed):
+        results[k] = result
+    labels = disambiguate_labels([label for label, _, _ in results], paths)
+    return [(label, iters, vals) for label, (_, iters, vals) in zip(labels, results)]
+
+
 def align_to_common_iteration(
-    series: List[Tuple[str, List[int], List[float]]]
-) -> Tuple[int, List[Tuple[str, List[int], List[float]]]]:
+    series: List[Tuple[str, np.ndarray, np.ndarray]]
+) -> Tuple[int, List[Tuple[str, np.ndarray, np.ndarray]]]:
     """
     Trims each series to [0..max_common_iter], where max_common_iter is the minimum of the
     maximum iteration discovered in each input.
     """
     max_iters = []
     for _, iters, _ in series:
-        if not iters:
+        if len(iters) == 0:
             max_iters.append(-1)
         else:
-            max_iters.append(max(iters))
+            max_iters.append(int(iters.max()))
     max_common = min(max_iters) if max_iters else -1
 
     aligned = []
     for label, iters, vals in series:
-        trimmed_iters = []
-        trimmed_vals = []
-        for i, v in zip(iters, vals):
-            if 0 <= i <= max_common:
-                trimmed_iters.append(i)
-                trimmed_vals.append(v)
-        aligned.append((label, trimmed_iters, trimmed_vals))
+        if np.all(iters[:-1] <= iters[1:]):
+            # Logs are appended in order, so the range is a contiguous slice.
+            lo = np.searchsorted(iters, 0, side="left")
+            hi = np.searchsorted(iters, max_common, side="right")
+            aligned.append((label, iters[lo:hi], vals[lo:hi]))
+        else:
+            mask = (iters >= 0) & (iters <= max_common)
+            aligned.append((label, iters[mask], vals[mask]))
     return max_common, aligned
 
 
+def _bucket_index(
+    it: np.ndarray,
+    buckets: int,
+) -> Optional[Tuple[np.ndarray, int, int]]:
+    """
+    Maps each iteration to one of `buckets` evenly spaced buckets across [min_it, max_it].
+    Returns (idx, min_it, max_it), or None if all iterations are the same.
+    """
+    n = it.size
+    if n > 1 and it[0] == 0 and it[-1] == n - 1 and np.all(np.diff(it) == 1):
+        # Canonical log (iterations exactly 0..n-1): the range is known, so skip the
+        # min/max reductions and clipping; only the last sample lands on `buckets`.
+        idx = it * buckets // (n - 1)
+        idx[-1] = buckets - 1
+        return idx, 0, n - 1
+
+    min_it = int(it.min())
+    max_it = int(it.max())
+    if max_it == min_it:
+        return None
+    idx = ((it - min_it) * buckets // (max_it - min_it)).clip(0, buckets - 1)
+    idx[it == max_it] = buckets - 1
+    return idx, min_it, max_it
+
+
+def _as_lists(iters: np.ndarray, vals: np.ndarray) -> Tuple[List[int], List[float]]:
+    return (np.asarray(iters, dtype=np.int64).tolist(),
+            np.asarray(vals, dtype=np.float64).tolist())
+
+
 def bucket_downsample(
-    iters: List[int],
-    vals: List[float],
+    iters: np.ndarray,
+    vals: np.ndarray,
     target_points: int,
 ) -> Tuple[List[int], List[float]]:
     """
     Reduce to ~target_points by bucketing across iteration range and averaging.
     Keeps the first and last points exactly (if present).
     """
-    if not iters or len(iters) <= target_points:
-        return iters, vals
+    if len(iters) == 0 or len(iters) <= target_points:
+        return _as_lists(iters, vals)
 
-    min_it = min(iters)
-    max_it = max(iters)
-    if max_it == min_it:
-        # Degenerate case: all iterations the same
-        return [iters[0]], [sum(vals) / len(vals)]
-
-    # We create evenly spaced bucket edges across [min_it, max_it]
+    it = np.asarray(iters, dtype=np.int64)
+    vv = np.asarray(vals, dtype=np.float64)
     buckets = target_points
-    edges = [min_it + (x * (max_it - min_it) / buckets) for x in range(buckets + 1)]
+    bucketed = _bucket_index(it, buckets)
+    if bucketed is None:
+        # Degenerate case: all iterations the same
+        return [int(it[0])], [float(vv.mean())]
+    idx, min_it, max_it = bucketed
 
     # Accumulate values per bucket
-    bucket_sums = [0.0] * buckets
-    bucket_counts = [0] * buckets
-    for i, v in zip(iters, vals):
-        if i == max_it:
-            idx = buckets - 1
-        else:
-            # find bucket index
-            idx = int((i - min_it) * buckets / (max_it - min_it))
-            idx = min(max(idx, 0), buckets - 1)
-        bucket_sums[idx] += v
-        bucket_counts[idx] += 1
-
-    down_iters = []
-    down_vals = []
-    for b in range(buckets):
-        if bucket_counts[b] > 0:
-            # represent the bucket by its center iteration and average value
-            left = edges[b]
-            right = edges[b + 1]
-            center = int(round((left + right) / 2.0))
-            down_iters.append(center)
-            down_vals.append(bucket_sums[b] / bucket_counts[b])
-
-    # Ensure first/last points correspond to min/max iteration if possible
-    if down_iters:
-        down_iters[0] = min_it
-        down_iters[-1] = max_it
-
-    return down_iters, down_vals
+    bucket_sums = np.bincount(idx, weights=vv, minlength=buckets)
+    bucket_counts = np.bincount(idx, minlength=buckets)
+
+    # represent each non-empty bucket by its center iteration (rounded half-up, in
+    # exact integer arithmetic) and average value
+    nonempty = bucket_counts > 0
+    span = max_it - min_it
+    centers = min_it + ((2 * np.arange(buckets) + 1) * span + buckets) // (2 * buckets)
+    down_iters = centers[nonempty]
+    down_vals = bucket_sums[nonempty] / bucket_counts[nonempty]
+
+    # Ensure first/last points correspond to min/max iteration
+    down_iters[0] = min_it
+    down_iters[-1] = max_it
+
+    return down_iters.tolist(), down_vals.tolist()
+
+
+def m4_downsample(
+    iters: np.ndarray,
+    vals: np.ndarray,
+    target_points: int,
+) -> Tuple[List[int], List[float]]:
+    """
+    M4 aggregation: keep the first, last, min and max sample of each bucket, using
+    target_points / 4 buckets. Unlike averaging, peaks survive downsampling.
+    """
+    if len(iters) == 0 or len(iters) <= target_points:
+        return _as_lists(iters, vals)
+
+    it = np.asarray(iters, dtype=np.int64)
+    vv = np.asarray(vals, dtype=np.float64)
+    buckets = max(1, target_points // 4)
+    bucketed = _bucket_index(it, buckets)
+    if bucketed is None:
+        # Degenerate case: all iterations the same
+        return [int(it[0])], [float(vv.mean())]
+    idx = bucketed[0]
+
+    # Order samples by iteration (stable for ties); idx is monotone in the iteration,
+    # so this also groups them by bucket with each bucket's first/last at its ends.
+    # Logs written in iteration order need no sort, so the sort and gathers are
+    # skipped. (A monotone idx is not enough: rows may be out of order in a bucket.)
+    if np.any(it[1:] < it[:-1]):
+        order = np.argsort(it, kind="stable")
+        idx = idx[order]
+        it = it[order]
+        vv = vv[order]
+
+    if target_points < 4:
+        # Fewer points than one bucket's worth: just the endpoints (or only the first).
+        picks = [0, len(it) - 1][:max(target_points, 0)]
+        return it[picks].tolist(), vv[picks].tolist()
+
+    starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    ends = np.r_[starts[1:], len(idx)] - 1
+    lengths = ends - starts + 1
+
+    # Position of the first min/max within each bucket
+    mins = np.minimum.reduceat(vv, starts)
+    maxs = np.maximum.reduceat(vv, starts)
+    min_hits = np.flatnonzero(vv == np.repeat(mins, lengths))
+    max_hits = np.flatnonzero(vv == np.repeat(maxs, lengths))
+    min_pos = min_hits[np.unique(idx[min_hits], return_index=True)[1]]
+    max_pos = max_hits[np.unique(idx[max_hits], return_index=True)[1]]
+
+    # Positions are in iteration order, so the sorted unique picks are too.
+    picks = np.unique(np.concatenate([starts, ends, min_pos, max_pos]))
+    return it[picks].tolist(), vv[picks].tolist()
+
+
+def lttb_downsample(
+    iters: np.ndarray,
+    vals: np.ndarray,
+    target_points: int,
+) -> Tuple[List[int], List[float]]:
+    """
+    Largest-Triangle-Three-Buckets: per bucket, keep the sample forming the largest
+    triangle with the previously kept sample and the average of the next bucket.
+    Keeps the first and last points exactly.
+    """
+    if len(iters) == 0 or len(iters) <= target_points:
+        return _as_lists(iters, vals)
+
+    it = np.asarray(iters, dtype=np.int64)
+    vv = np.asarray(vals, dtype=np.float64)
+    if np.any(it[1:] < it[:-1]):
+        order = np.argsort(it, kind="stable")
+        it = it[order]
+        vv = vv[order]
+    n = len(it)
+    if target_points < 3:
+        # No inner buckets: just the endpoints (or only the first point).
+        picks = [0, n - 1][:max(target_points, 0)]
+        return it[picks].tolist(), vv[picks].tolist()
+    x = it.astype(np.float64)
+
+    # Bucket i (of target_points - 2 inner buckets) covers [bounds[i], bounds[i + 1])
+    bounds = np.arange(target_points - 1) * (n - 2) // (target_points - 2) + 1
+
+    picks = np.empty(target_points, dtype=np.int64)
+    picks[0] = 0
+    picks[-1] = n - 1
+    a = 0
+    for b in range(target_points - 2):
+        lo, hi = bounds[b], bounds[b + 1]
+        nlo, nhi = hi, (bounds[b + 2] if b + 2 < len(bounds) else n)
+        avg_x = x[nlo:nhi].mean()
+        avg_y = vv[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (vv[lo:hi] - vv[a]) - (x[a] - x[lo:hi]) * (avg_y - vv[a]))
+        a = lo + int(area.argmax())
+        picks[b + 1] = a
+    return it[picks].tolist(), vv[picks].tolist()
+
+
+DOWNSAMPLERS = {
+    "mean": bucket_downsample,
+    "m4": m4_downsample,
+    "lttb": lttb_downsample,
+}
+
+
+def _open_output(out_path: str, compress: bool = False) -> BinaryIO:
+    """
+    Opens an output file for binary writing, gzip-compressed if the path ends in .gz
+    or compress is set.
+    """
+    if compress or out_path.endswith(".gz"):
+        return gzip.open(out_path, "wb", compresslevel=6)
+    return open(out_path, "wb")
 
 
 def write_reduced_json(
     out_path: str,
     metric: Metric,
     series: List[Tuple[str, List[int], List[float]]],
+    columnar: bool = False,
+    compress: bool = False,
 ) -> None:
     """
     Writes a compact JSON structure for the web:
@@ -195,35 +516,107 @@ def write_reduced_json(
         {"label": "Postgres", "points": [...]}
       ]
     }
+    With columnar=True each series is instead
+    {"label": "DuckDB", "iterations": [0, ...], "values": [103.2, ...]},
+    which avoids repeating the key names for every point.
+    Output is gzipped for a .gz path or with compress=True.
     """
-    out = {
-        "metric": metric,
-        "unit": "MB",
-        "series": []
+    # Written one series at a time so only a single series is ever materialized.
+    with _open_output(out_path, compress) as f:
+        f.write(b'{"metric":' + _json_dumps(metric) + b',"unit":"MB","series":[')
+        for k, (label, iters, vals) in enumerate(series):
+            if k:
+                f.write(b",")
+            if columnar:
+                entry = {
+                    "label": label,
+                    "iterations": np.asarray(iters, dtype=np.int64),
+                    "values": np.asarray(vals, dtype=np.float64),
+                }
+            else:
+                points = [{"iteration": int(i), "value": float(v)} for i, v in zip(iters, vals)]
+                entry = {"label": label, "points": points}
+            f.write(_json_dumps(entry))
+        f.write(b"]}")
+
+
+def write_vega_spec(
+    out_path: str,
+    metric: Metric,
+    series: List[Tuple[str, np.ndarray, np.ndarray]],
+    compress: bool = False,
+) -> None:
+    """
+    Writes a self-contained Vega-Lite line chart spec. Data is stored per series as
+    parallel arrays and expanded by a flatten transform in the browser.
+    """
+    name = human_metric_name(metric)
+    spec = {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": f"{name} vs Iteration",
+        "width": 800,
+        "height": 450,
+        "data": {"values": [
+            {"label": label, "iteration": list(map(int, iters)), "value": list(map(float, vals))}
+            for label, iters, vals in series
+        ]},
+        "transform": [{"flatten": ["iteration", "value"]}],
+        "mark": "line",
+        "encoding": {
+            "x": {"field": "iteration", "type": "quantitative", "title": "Iteration"},
+            "y": {"field": "value", "type": "quantitative", "title": f"{name} (MB)"},
+            "color": {"field": "label", "type": "nominal", "title": None},
+        },
     }
-    for label, iters, vals in series:
-        points = [{"iteration": int(i), "value": float(v)} for i, v in zip(iters, vals)]
-        out["series"].append({"label": label, "points": points})
-    with open(out_path, "w") as f:
-        json.dump(out, f, separators=(",", ":"))  # minified
+    with _open_output(out_path, compress) as f:
+        f.write(_json_dumps(spec))
+
+
+# Series are already downsampled; path simplification would only cost time (and could
+# shave off the extrema M4 kept). Applied with rc_context so global rcParams are untouched.
+_PLOT_RC = {"path.simplify": False}
+
+
+def _make_fig() -> Tuple[Any, Any]:
+    """
+    Creates the (figure, axes) pair used for PNG output. The figure is built without
+    pyplot, so it can be redrawn for several metrics without accumulating global state.
+    """
+    # Imported lazily: matplotlib startup dominates runs that only emit JSON.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6), layout="tight")
+    ax = fig.add_subplot()
+    return fig, ax
 
 
 def plot_series(
+    ax: Any,
     metric: Metric,
-    series: List[Tuple[str, List[int], List[float]]],
-    out_path: str,
+    series: List[Tuple[str, np.ndarray, np.ndarray]],
 ) -> None:
-    plt.figure(figsize=(10, 6))
-    for label, iters, vals in series:
-        if iters and vals:
-            plt.plot(iters, vals, label=label)
-    plt.xlabel("Iteration")
-    plt.ylabel(f"{human_metric_name(metric)} (MB)")
-    plt.title(f"{human_metric_name(metric)} vs Iteration (aligned to common max iteration)")
-    plt.legend()
-    plt.grid(True, linestyle="--", linewidth=0.5, alpha=0.6)
-    plt.tight_layout()
-    plt.savefig(out_path, dpi=150)
+    import matplotlib
+
+    with matplotlib.rc_context(_PLOT_RC):
+        ax.cla()
+        for label, iters, vals in series:
+            if len(iters) and len(vals):
+                ax.plot(iters, vals, label=label)
+        ax.set_xlabel("Iteration")
+        ax.set_ylabel(f"{human_metric_name(metric)} (MB)")
+        ax.set_title(f"{human_metric_name(metric)} vs Iteration (aligned to common max iteration)")
+        if len(series) > 1:
+            ax.legend()
+        ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.6)
+
+
+def save_plot(fig: Any, out_path: str, compress_level: int = 3) -> None:
+    import matplotlib
+
+    with matplotlib.rc_context(_PLOT_RC):
+        # Lower zlib levels encode much faster for a modest size cost on flat-color plots.
+        fig.savefig(out_path, dpi=120, metadata={"Software": None},
+                    pil_kwargs={"compress_level": compress_level})
 
 
 def main():
@@ -234,18 +627,35 @@ def main():
                         help="Metric to compare (default: rss)")
     parser.add_argument("--target-points", type=int, default=300,
                         help="Approximate number of points per series after downsampling (default: 300)")
+    parser.add_argument("--downsample", default="m4", choices=sorted(DOWNSAMPLERS),
+                        help="Downsampling method: m4 keeps per-bucket extrema, lttb keeps visually "
+                             "significant points, mean averages buckets (default: m4)")
     parser.add_argument("--output-plot", default=None, help="Path to save PNG plot")
+    parser.add_argument("--png-compress-level", type=int, default=3, choices=range(10),
+                        metavar="0-9", help="zlib level for the PNG plot (default: 3)")
     parser.add_argument("--output-json", default=None, help="Path to save reduced JSON")
+    parser.add_argument("--output-vega", default=None, help="Path to save Vega-Lite chart spec")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Write reduced JSON as iterations/values arrays instead of point objects")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Gzip JSON/Vega outputs (implied for paths ending in .gz)")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="Reuse/write parsed arrays in <file>.<metric>.npz sidecars (default: on)")
+    parser.add_argument("--stream-parse", action="store_true",
+                        help="Parse logs incrementally with ijson to cut peak memory (slower)")
     parser.add_argument("--no-align", action="store_true",
                         help="Do not trim to common max iteration (compare full ranges)")
 
     args = parser.parse_args()
+    if args.stream_parse and ijson is None:
+        parser.error("--stream-parse requires ijson (pip install ijson)")
 
     # Load all series
     loaded = []
-    for path in args.files:
-        label, iters, vals = load_series(path, args.metric)
-        if not iters:
+    results = load_all_series(args.files, args.metric, cache=args.cache,
+                              stream=args.stream_parse)
+    for path, (label, iters, vals) in zip(args.files, results):
+        if len(iters) == 0:
             print(f"Warning: no iterations for {path}, skipping.")
             continue
         loaded.append((label, iters, vals))
@@ -262,26 +672,35 @@ def main():
             print(f"Aligned to common max iteration: {max_common}")
 
     # Downsample
+    downsample = DOWNSAMPLERS[args.downsample]
     downsampled = []
     for label, iters, vals in loaded:
-        di, dv = bucket_downsample(iters, vals, args.target_points)
+        di, dv = downsample(iters, vals, args.target_points)
         downsampled.append((label, di, dv))
 
     # Outputs
     if args.output_plot:
-        plot_series(args.metric, downsampled, args.output_plot)
+        fig, ax = _make_fig()
+        plot_series(ax, args.metric, downsampled)
+        save_plot(fig, args.output_plot, args.png_compress_level)
         print(f"Wrote plot: {args.output_plot}")
 
     if args.output_json:
-        write_reduced_json(args.output_json, args.metric, downsampled)
+        write_reduced_json(args.output_json, args.metric, downsampled,
+                           columnar=args.columnar, compress=args.gzip)
         print(f"Wrote reduced JSON: {args.output_json}")
 
-    # If neither is specified, print a quick textual summary
-    if not args.output_plot and not args.output_json:
+    if args.output_vega:
+        write_vega_spec(args.output_vega, args.metric, downsampled, compress=args.gzip)
+        print(f"Wrote Vega-Lite spec: {args.output_vega}")
+
+    # If no output is specified, print a quick textual summary
+    if not args.output_plot and not args.output_json and not args.output_vega:
         print(f"Metric: {args.metric} (MB)")
         for label, iters, vals in downsampled:
-            if vals:
-                print(f"{label}: {len(vals)} points, min={min(vals):.1f} MB, max={max(vals):.1f} MB")
+            arr = np.asarray(vals)
+            if arr.size:
+                print(f"{label}: {arr.size} points, min={arr.min():.1f} MB, max={arr.max():.1f} MB")
             else:
                 print(f"{label}: no data after downsampling")
 